@@ -0,0 +1,87 @@
+"""
+Numeric kernels for the RLCE demo.
+
+Hot geometry primitives live here so they can be JIT-compiled with Numba
+when it is installed. Without Numba the same functions run as plain
+Python/NumPy, so the demo only hard-requires pygame and numpy.
+"""
+import math
+
+import numpy as np
+
+try:
+    from numba import guvectorize, njit
+except ImportError:  # Numba is optional
+    guvectorize = None
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda fn: fn
+
+# ---------------------------- JIT kernels -----------------------------
+_ADVANCE_FIXED_SRC = """
+SEG_LEN = {seg_len!r}
+INV_SEG_LEN = {inv_seg_len!r}
+AX = {ax!r}
+AY = {ay!r}
+ABX = {abx!r}
+ABY = {aby!r}
+
+def advance_along_route_fixed(route_t, dt_px):
+    seg_i = int(math.floor(route_t))
+    local_t = route_t - seg_i
+    seg_i = min(max(seg_i, 0), {last})
+    if SEG_LEN[seg_i] < 1e-6:
+        return route_t + 1e-3, AX[seg_i], AY[seg_i]
+    local_t += dt_px * INV_SEG_LEN[seg_i]
+    while local_t > 1.0 and seg_i < {last}:
+        local_t -= 1.0
+        seg_i += 1
+    if local_t > 1.0 and seg_i == {last}:
+        seg_i = 0
+        local_t = 0.0
+    return seg_i + local_t, AX[seg_i] + ABX[seg_i]*local_t, AY[seg_i] + ABY[seg_i]*local_t
+"""
+
+def specialize_advance(A_xy, AB_xy, seg_len, inv_seg_len):
+    """
+    Build advance_along_route_fixed(route_t, dt_px) -> (new_t, x, y) for one
+    fixed polyline. Segment geometry and count are baked into the generated
+    source as literals, so Numba can treat them as constants and unroll.
+
+    Two deliberate departures from the original lerp-based loop: on
+    wrap-around the train is placed at points[0] straight away (it used to
+    be drawn at the start of the last segment for one frame), and on a
+    degenerate segment it moves to that segment's point instead of keeping
+    its previous x/y.
+    """
+    lit = lambda arr: tuple(float(v) for v in arr)
+    src = _ADVANCE_FIXED_SRC.format(
+        seg_len=lit(seg_len), inv_seg_len=lit(inv_seg_len),
+        ax=lit(A_xy[:, 0]), ay=lit(A_xy[:, 1]), abx=lit(AB_xy[:, 0]), aby=lit(AB_xy[:, 1]),
+        last=len(seg_len)-1)
+    ns = {"math": math}
+    exec(compile(src, "<advance_along_route_fixed>", "exec"), ns)
+    return njit(fastmath=True)(ns["advance_along_route_fixed"])
+
+if guvectorize is not None:
+    @guvectorize(['(f4[:,:], f4[:,:], f4[:], f4[:], f4[:])'], '(n,m),(n,m),(n),(m)->(n)',
+                 nopython=True, fastmath=True, cache=True)
+    def project_all(A, AB, inv_AB2, p, out_d2):
+        """Squared distance from p to each segment A[i] + t*AB[i] (inv_AB2 = 1/|AB|^2, 0 if degenerate)."""
+        for i in range(A.shape[0]):
+            ax, ay = A[i, 0], A[i, 1]
+            abx, aby = AB[i, 0], AB[i, 1]
+            t = min(max(((p[0] - ax)*abx + (p[1] - ay)*aby) * inv_AB2[i], 0.0), 1.0)
+            dx = p[0] - (ax + abx*t)
+            dy = p[1] - (ay + aby*t)
+            out_d2[i] = dx*dx + dy*dy
+else:
+    def project_all(A, AB, inv_AB2, p, out_d2=None):
+        """Squared distance from p to each segment A[i] + t*AB[i] (inv_AB2 = 1/|AB|^2, 0 if degenerate)."""
+        AP = p - A
+        t = (AP*AB).sum(1)
+        t *= inv_AB2
+        np.minimum(np.maximum(t, 0.0, out=t), 1.0, out=t)
+        AP -= AB*t[:, None]
+        return np.einsum('ij,ij->i', AP, AP, out=out_d2)
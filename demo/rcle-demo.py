@@ -11,21 +11,29 @@ Fixes:
 
 If anything fails, errors go to rlce_debug.log.
 """
-import os, time, math, random, traceback
+import atexit, os, time, math, random, traceback
+from collections import deque
+from itertools import islice
 from dataclasses import dataclass, field
-from typing import List, Tuple, Optional, Set
+from typing import Callable, Dict, FrozenSet, List, Tuple, Optional, Set
+import numpy as np
 import pygame
+from _kernels import project_all, specialize_advance
 
 # ——— Safety for systems without audio, and hide support prompt ———
 os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
 os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
 
 LOGFILE = "rlce_debug.log"
+_log_fh = None  # opened on first log(), line-buffered, closed at exit
 
 def log(msg: str):
+    global _log_fh
     try:
-        with open(LOGFILE, "a", encoding="utf-8") as f:
-            f.write(f"[{time.strftime('%H:%M:%S')}] {msg}\n")
+        if _log_fh is None:
+            _log_fh = open(LOGFILE, "a", buffering=1, encoding="utf-8")
+            atexit.register(_log_fh.close)
+        _log_fh.write(f"[{time.strftime('%H:%M:%S')}] {msg}\n")
     except Exception:
         pass
 
@@ -40,6 +48,14 @@ TEXT_COLOR = (235, 235, 235)
 PANEL_BG = (22, 24, 32)
 BG = (18, 20, 26)
 
+# held-arrow bitmap bits, maintained from KEYDOWN/KEYUP in the event pump
+BIT_LEFT, BIT_RIGHT, BIT_UP, BIT_DOWN = range(4)
+ARROW_BITS = {pygame.K_LEFT: BIT_LEFT, pygame.K_RIGHT: BIT_RIGHT, pygame.K_UP: BIT_UP, pygame.K_DOWN: BIT_DOWN}
+
+# rebuild_cal uses the dense (segments x towers) broadcast up to this many pairs and the
+# uniform grid beyond it, to bound the size of the broadcast temporaries
+CAL_BROADCAST_MAX_PAIRS = 4_000_000
+
 TOWER_COLORS = {
     "clean": (90, 200, 90),
     "rogue": (230, 80, 80),
@@ -48,33 +64,14 @@ TOWER_COLORS = {
 
 random.seed(42)
 
-# ---------------------------- Geometry utils --------------------------
-def lerp(a, b, t):
-    return (a[0] + (b[0] - a[0]) * t, a[1] + (b[1] - a[1]) * t)
-
-def clamp(v, lo, hi):
-    return max(lo, min(hi, v))
-
-def dist(a, b):
-    return math.hypot(a[0]-b[0], a[1]-b[1])
-
-def project_point_to_segment(p, a, b):
-    ax, ay = a; bx, by = b; px, py = p
-    abx, aby = bx-ax, by-ay
-    ab2 = abx*abx + aby*aby
-    if ab2 == 0:
-        return a, 0.0, dist(p, a)
-    apx, apy = px-ax, py-ay
-    t = (apx*abx + apy*aby) / ab2
-    t = clamp(t, 0.0, 1.0)
-    q = (ax + abx*t, ay + aby*t)
-    return q, t, dist(p, q)
-
 # ---------------------------- Domain types ----------------------------
 PLMNS = ["310260", "311480", "310410"]  # demo operators
-ALLOWED_ARFCN = {"LTE": {66486, 66490, 66500, 5140, 1302}, "NR": {523800, 627936}}
+ALLOWED_ARFCN = {"LTE": frozenset({66486, 66490, 66500, 5140, 1302}), "NR": frozenset({523800, 627936})}
+# one bit per allowed ARFCN, so the band check in legitimacy_check is a single AND
+ARFCN_BIT = {a: 1 << i for i, a in enumerate(sorted(frozenset().union(*ALLOWED_ARFCN.values())))}
+ALLOWED_ARFCN_MASK = {tech: sum(ARFCN_BIT[a] for a in arfcns) for tech, arfcns in ALLOWED_ARFCN.items()}
 
-@dataclass
+@dataclass(slots=True)
 class CellTower:
     id: int
     x: float
@@ -85,15 +82,17 @@ class CellTower:
     tac: int
     pci: int
     rogue: bool = False
+    _arfcn_bit: int = field(default=0, init=False, repr=False, compare=False)  # set only by RLCE.refresh_towers
     def pos(self):
         return (self.x, self.y)
 
-@dataclass
+@dataclass(slots=True)
 class Segment:
     idx: int
     a: Tuple[float, float]
     b: Tuple[float, float]
     cal: Set[int] = field(default_factory=set)
+    cal_arr: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int32), repr=False)
     def mid(self):
         return ((self.a[0]+self.b[0])/2, (self.a[1]+self.b[1])/2)
 
@@ -102,12 +101,40 @@ class Route:
     points: List[Tuple[float, float]]
     segments: List[Segment]
     operator_plmn: str = "310260"
+    # SoA copies of the segment endpoints for the vectorized geometry paths
+    A: np.ndarray = field(init=False, repr=False)
+    B: np.ndarray = field(init=False, repr=False)
+    mid: np.ndarray = field(init=False, repr=False)
+    AB: np.ndarray = field(init=False, repr=False)
+    AB2: np.ndarray = field(init=False, repr=False)
+    inv_AB2: np.ndarray = field(init=False, repr=False)
+    seg_len: np.ndarray = field(init=False, repr=False)
+    inv_seg_len: np.ndarray = field(init=False, repr=False)
+    advance_fixed: Optional[Callable] = field(init=False, repr=False)
+    _d2_buf: np.ndarray = field(init=False, repr=False)  # scratch for locate_segment
+    def __post_init__(self):
+        self.A = np.array([seg.a for seg in self.segments], dtype=np.float32).reshape(-1, 2)
+        self.B = np.array([seg.b for seg in self.segments], dtype=np.float32).reshape(-1, 2)
+        self.mid = (self.A + self.B) * np.float32(0.5)
+        self.AB = self.B - self.A
+        self.AB2 = (self.AB*self.AB).sum(1)
+        self.inv_AB2 = np.divide(1.0, self.AB2, out=np.zeros_like(self.AB2), where=self.AB2 > 0)
+        self.seg_len = np.sqrt(self.AB2)
+        self.inv_seg_len = np.divide(1.0, self.seg_len, out=np.zeros_like(self.seg_len), where=self.seg_len >= 1e-6)
+        self._d2_buf = np.empty(len(self.segments), dtype=np.float32)
+        # the polyline never changes, so specialize route advancement to it; the
+        # zero-length call forces the (lazy) JIT compile now rather than on the
+        # first auto-mode frame, where the pause would show up in dt
+        self.advance_fixed = None
+        if self.segments:
+            self.advance_fixed = specialize_advance(self.A, self.AB, self.seg_len, self.inv_seg_len)
+            self.advance_fixed(0.0, 0.0)
     @classmethod
     def from_polyline(cls, pts):
         segs = [Segment(i, pts[i], pts[i+1]) for i in range(len(pts)-1)]
         return cls(points=pts, segments=segs)
 
-@dataclass
+@dataclass(slots=True)
 class Train:
     x: float; y: float
     speed: float = 120.0       # px/s manual
@@ -116,68 +143,160 @@ class Train:
     route_t: float = 0.0       # param along route [0..len(segments))
     auto: bool = False
     def pos(self): return (self.x, self.y)
+    def pos_f32(self): return np.array((self.x, self.y), dtype=np.float32)
 
 # ---------------------------- RLCE Engine -----------------------------
 class RLCE:
     def __init__(self, route: Route, towers: List[CellTower]):
         self.route = route
         self.towers = towers
+        self._window_cache: Dict[int, FrozenSet[int]] = {}
+        self._window_arr_cache: Dict[int, np.ndarray] = {}
         self.grace = 1
         self.hysteresis = 40.0
         self.poll_ms = 250
         self.last_seg_idx: Optional[int] = None
         self.last_serving: Optional[CellTower] = None
         self.last_poll_time = 0.0
-        self.log: List[str] = []
+        self.log: deque[str] = deque(maxlen=8)
+        self.grid_cell = 220.0  # uniform grid cell size (px), matches the CAL radius
+        self.refresh_towers()
+
+    @property
+    def grace(self):
+        return self._grace
+
+    @grace.setter
+    def grace(self, g):
+        self._grace = g
+        self._window_cache.clear()
+        self._window_arr_cache.clear()
+
+    def refresh_towers(self):
+        # cached tower positions/flags (tower id == row); call whenever the towers change
+        self._tower_xy = np.array([tw.pos() for tw in self.towers], dtype=np.float32).reshape(-1, 2)
+        self._tower_rogue = np.array([tw.rogue for tw in self.towers], dtype=bool)
+        for tw in self.towers:
+            tw._arfcn_bit = ARFCN_BIT.get(tw.arfcn, 0)
+        cells: Dict[Tuple[int, int], List[int]] = {}
+        cell = self.grid_cell
+        for i, (x, y) in enumerate(self._tower_xy.tolist()):
+            cells.setdefault((int(x // cell), int(y // cell)), []).append(i)
+        self._grid: Dict[Tuple[int, int], np.ndarray] = {
+            c: np.array(ids, dtype=np.intp) for c, ids in cells.items()}
+
+    def grid_candidates(self, p, radius):
+        """Ids of towers in the grid cells that can hold a tower within radius of p."""
+        cell = self.grid_cell
+        cx, cy = int(p[0] // cell), int(p[1] // cell)
+        k = math.ceil(radius / cell)
+        grid = self._grid
+        hits = [grid[c] for c in ((gx, gy) for gx in range(cx-k, cx+k+1) for gy in range(cy-k, cy+k+1))
+                if c in grid]
+        return np.concatenate(hits) if hits else np.empty(0, dtype=np.intp)
 
     def rebuild_cal(self, radius_px: float = 220.0):
-        for seg in self.route.segments:
-            seg.cal.clear()
-            mid = seg.mid()
-            for tw in self.towers:
-                if dist(mid, tw.pos()) <= radius_px and not tw.rogue:
-                    seg.cal.add(tw.id)
+        xy, rogue = self._tower_xy, self._tower_rogue
+        r2 = radius_px*radius_px
+        segs = self.route.segments
+        if len(segs) * len(self.towers) <= CAL_BROADCAST_MAX_PAIRS:
+            # one (S,N) broadcast beats per-segment grid lookups on this canvas
+            mids = self.route.mid
+            dx = mids[:, None, 0] - xy[None, :, 0]
+            dy = mids[:, None, 1] - xy[None, :, 1]
+            mask = (dx*dx + dy*dy <= r2) & ~rogue[None, :]
+            rows, cols = np.nonzero(mask)
+            cols = cols.astype(np.int32)
+            bounds = np.searchsorted(rows, np.arange(len(segs)+1)).tolist()
+            for i, seg in enumerate(segs):
+                seg.cal_arr = cols[bounds[i]:bounds[i+1]]
+                seg.cal = set(seg.cal_arr.tolist())
+        else:
+            for seg, mid in zip(segs, self.route.mid):
+                ids = self.grid_candidates(mid, radius_px)
+                if ids.size:
+                    d = xy[ids] - mid
+                    ids = ids[((d*d).sum(1) <= r2) & ~rogue[ids]]
+                seg.cal = set(ids.tolist())
+                seg.cal_arr = ids.astype(np.int32)
+        self._window_cache.clear()
+        self._window_arr_cache.clear()
 
     def locate_segment(self, p):
-        dists = []
-        for seg in self.route.segments:
-            _, _, dpx = project_point_to_segment(p, seg.a, seg.b)
-            dists.append((dpx, seg.idx))
-        dists.sort()
-        nearest_idx = dists[0][1]
+        r = self.route
+        p = np.asarray(p, dtype=np.float32)
+        d2 = r._d2_buf
+        project_all(r.A, r.AB, r.inv_AB2, p, d2)
+        nearest_idx = int(d2.argmin())
         if self.last_seg_idx is None:
             self.last_seg_idx = nearest_idx
             return nearest_idx
-        cur_seg = self.route.segments[self.last_seg_idx]
-        _, _, d_current = project_point_to_segment(p, cur_seg.a, cur_seg.b)
-        _, _, d_new = project_point_to_segment(p, self.route.segments[nearest_idx].a, self.route.segments[nearest_idx].b)
-        if d_new + self.hysteresis < d_current:
+        if nearest_idx == self.last_seg_idx:
+            return nearest_idx
+        # d_new + h < d_cur implies d2_new + h*h < d2_cur: a sqrt-free prefilter,
+        # after which only the two finalists need their roots taken
+        h = self.hysteresis
+        d2_current, d2_new = float(d2[self.last_seg_idx]), float(d2[nearest_idx])
+        if d2_new + h*h < d2_current and math.sqrt(d2_new) + h < math.sqrt(d2_current):
             self.last_seg_idx = nearest_idx
         return self.last_seg_idx
 
     def cal_window(self, idx):
-        s = set()
-        for j in range(max(0, idx-self.grace), min(len(self.route.segments)-1, idx+self.grace)+1):
-            s |= self.route.segments[j].cal
-        return s
+        window = self._window_cache.get(idx)
+        if window is None:
+            segs = self.route.segments
+            lo, hi = max(0, idx-self.grace), min(len(segs)-1, idx+self.grace)
+            window = frozenset().union(*(s.cal for s in segs[lo:hi+1]))
+            self._window_cache[idx] = window
+        return window
+
+    def cal_window_arr(self, idx):
+        arr = self._window_arr_cache.get(idx)
+        if arr is None:
+            segs = self.route.segments
+            lo, hi = max(0, idx-self.grace), min(len(segs)-1, idx+self.grace)
+            arr = np.unique(np.concatenate([segs[j].cal_arr for j in range(lo, hi+1)]))
+            self._window_arr_cache[idx] = arr
+        return arr
+
+    def nearest_in_window(self, p, idx) -> Optional[CellTower]:
+        window_arr = self.cal_window_arr(idx)
+        if window_arr.size == 0:
+            return None
+        cand_xy = self._tower_xy[window_arr]
+        d2 = ((cand_xy - np.asarray(p, dtype=np.float32))**2).sum(1)
+        return self.towers[int(window_arr[d2.argmin()])]
+
+    def _tower_d2(self, p):
+        d = self._tower_xy - np.asarray(p, dtype=np.float32)
+        return (d*d).sum(1)
 
     def nearest_tower(self, p):
-        return min(self.towers, key=lambda tw: dist(p, tw.pos()))
+        return self.towers[int(self._tower_d2(p).argmin())]
+
+    def find_nearby_tower(self, pos, radius=150) -> Optional[CellTower]:
+        ids = self.grid_candidates(pos, radius)
+        if ids.size == 0:
+            return None
+        d = self._tower_xy[ids] - np.asarray(pos, dtype=np.float32)
+        d2 = (d*d).sum(1)
+        i = int(d2.argmin())
+        return self.towers[int(ids[i])] if d2[i] <= radius*radius else None
 
     def legitimacy_check(self, cur, prev):
-        score = 0
-        if cur.plmn == self.route.operator_plmn: score += 1
-        if prev is None or abs(cur.tac - prev.tac) <= 1: score += 1
-        if cur.arfcn in ALLOWED_ARFCN.get(cur.tech, set()): score += 1
-        return score
+        return ((cur.plmn == self.route.operator_plmn)
+                + (prev is None or abs(cur.tac - prev.tac) <= 1)
+                + bool(cur._arfcn_bit & ALLOWED_ARFCN_MASK.get(cur.tech, 0)))
 
     def step(self, train: Train, now: float):
+        """Returns (seg_idx, decision, serving, window); decision is "…" between polls."""
+        p = train.pos_f32()
+        seg_idx = self.locate_segment(p)
+        window = self.cal_window(seg_idx)
         if (now - self.last_poll_time) * 1000.0 < self.poll_ms:
-            return None
+            return seg_idx, "…", self.last_serving, window
         self.last_poll_time = now
-        seg_idx = self.locate_segment(train.pos())
-        window = self.cal_window(seg_idx)
-        serving = self.nearest_tower(train.pos())
+        serving = self.nearest_tower(p)
         allowed = serving.id in window
         decision = "ALLOWED" if allowed else "CHECK"
         if not allowed:
@@ -186,18 +305,16 @@ class RLCE:
                 decision = "ALLOWED*"
             else:
                 decision = "BARRED"
-                candidates = [tw for tw in self.towers if tw.id in window]
-                serving = min(candidates, key=lambda tw: dist(train.pos(), tw.pos())) if candidates else None
+                serving = self.nearest_in_window(p, seg_idx)
         if serving is not None:
             self.last_serving = serving
         self.log_event(seg_idx, decision, serving.id if serving else None)
-        return seg_idx, decision, serving
+        return seg_idx, decision, serving, window
 
     def log_event(self, seg_idx, decision, cell_id):
         ts = time.strftime("%H:%M:%S")
         line = f"{ts} seg={seg_idx} decision={decision} cell={cell_id}"
         self.log.append(line)
-        self.log = self.log[-8:]
 
 # ---------------------------- World setup -----------------------------
 def make_route() -> Route:
@@ -253,40 +370,64 @@ class UI:
             "Scaleybark","New Bern","East/West","Bland","Carson","Stonewall",
             "3rd/CTC","Arena","7th St","Parkwood","25th","36th","Sugar Ck","Tryon","JW Clay"
         ]
-
-    def draw_route(self):
-        pygame.draw.lines(self.screen, ROUTE_COLOR, False, self.rlce.route.points, 3)
+        self._window_geom = {}
+        self._window_grace = None
+        self.refresh_towers()
+        # route and station labels are static; render them once
+        self._bg = self.render_background()
+
+    def render_background(self):
+        bg = pygame.Surface((W, H)).convert()
+        bg.fill(BG)
+        pygame.draw.lines(bg, ROUTE_COLOR, False, self.rlce.route.points, 3)
         for i, seg in enumerate(self.rlce.route.segments):
             mid = seg.mid()
-            pygame.draw.circle(self.screen, SEG_COLOR, (int(mid[0]), int(mid[1])), 4)
+            pygame.draw.circle(bg, SEG_COLOR, (int(mid[0]), int(mid[1])), 4)
             if i < len(self.stations):
                 label = self.font_small.render(self.stations[i], True, (180, 200, 230))
-                self.screen.blit(label, (int(mid[0]) + 6, int(mid[1]) - 10))
+                bg.blit(label, (int(mid[0]) + 6, int(mid[1]) - 10))
+        return bg
 
-    def draw_segment_window(self, seg_idx):
+    def draw_route(self):
+        self.screen.blit(self._bg, (0, 0))
+
+    def refresh_towers(self):
+        # integer draw positions; call alongside RLCE.refresh_towers
+        self._tower_pts = [(int(tw.x), int(tw.y)) for tw in self.rlce.towers]
+
+    def window_geometry(self, seg_idx):
+        # emphasis polyline + end markers per segment, rebuilt when grace changes
         g = self.rlce.grace
-        for j in range(max(0, seg_idx-g), min(len(self.rlce.route.segments)-1, seg_idx+g)+1):
-            seg = self.rlce.route.segments[j]
-            pygame.draw.line(self.screen, CUR_SEG_COLOR, seg.a, seg.b, 6)
-        left = max(0, seg_idx-g)
-        right = min(len(self.rlce.route.segments)-1, seg_idx+g)
-        for k in (left, right):
-            seg = self.rlce.route.segments[k]
-            pygame.draw.circle(self.screen, (255,230,120), (int(seg.a[0]), int(seg.a[1])), 6, 2)
-            pygame.draw.circle(self.screen, (255,230,120), (int(seg.b[0]), int(seg.b[1])), 6, 2)
-
-    def draw_towers(self, serving: Optional[CellTower], window_ids: Set[int]):
-        for tw in self.rlce.towers:
-            if serving and tw.id == serving.id:
+        if g != self._window_grace:
+            self._window_geom.clear()
+            self._window_grace = g
+        geom = self._window_geom.get(seg_idx)
+        if geom is None:
+            segs = self.rlce.route.segments
+            left, right = max(0, seg_idx-g), min(len(segs)-1, seg_idx+g)
+            pts = self.rlce.route.points[left:right+2]
+            ends = [(int(p[0]), int(p[1])) for k in (left, right) for p in (segs[k].a, segs[k].b)]
+            geom = self._window_geom[seg_idx] = (pts, ends)
+        return geom
+
+    def draw_segment_window(self, seg_idx):
+        pts, ends = self.window_geometry(seg_idx)
+        pygame.draw.lines(self.screen, CUR_SEG_COLOR, False, pts, 6)
+        for c in ends:
+            pygame.draw.circle(self.screen, (255,230,120), c, 6, 2)
+
+    def draw_towers(self, serving: Optional[CellTower], window_ids: FrozenSet[int]):
+        serving_id = serving.id if serving else -1
+        for tw, c in zip(self.rlce.towers, self._tower_pts):
+            if tw.id == serving_id:
                 color = TOWER_COLORS["serving"]
-            elif tw.rogue:
-                color = TOWER_COLORS["rogue"]
+                r = 7
             else:
-                color = TOWER_COLORS["clean"]
-            r = 7 if serving and tw.id == serving.id else 4
-            pygame.draw.circle(self.screen, color, (int(tw.x), int(tw.y)), r)
+                color = TOWER_COLORS["rogue"] if tw.rogue else TOWER_COLORS["clean"]
+                r = 4
+            pygame.draw.circle(self.screen, color, c, r)
             if tw.id in window_ids:
-                pygame.draw.circle(self.screen, (200,200,255), (int(tw.x), int(tw.y)), r+3, 1)
+                pygame.draw.circle(self.screen, (200,200,255), c, r+3, 1)
 
     def draw_train(self):
         x, y = int(self.train.x), int(self.train.y)
@@ -306,7 +447,7 @@ class UI:
             self.screen.blit(self.font.render(t, True, TEXT_COLOR), (16, 10 + i*18))
         x0 = W-460
         self.screen.blit(self.font.render("events:", True, TEXT_COLOR), (x0, 10))
-        for i, line in enumerate(self.rlce.log[-5:][::-1]):
+        for i, line in enumerate(islice(reversed(self.rlce.log), 5)):
             self.screen.blit(self.font_small.render(line, True, (200,200,200)), (x0,30+i*16))
         hint = "Arrows | Space auto | R rogue | G/H grace | 1/2 d | 3/4 Dt | L reselection | N new net | S screenshot | Esc x2 to exit"
         self.screen.blit(self.font_small.render(hint, True, (180,180,200)), (16,72))
@@ -320,38 +461,7 @@ class UI:
 def advance_along_route(train: Train, route: Route, dt: float):
     if not route.segments:
         return
-    total_segments = len(route.segments)
-    seg_i = int(math.floor(train.route_t))
-    local_t = train.route_t - seg_i
-    seg_i = clamp(seg_i, 0, total_segments-1)
-    seg = route.segments[seg_i]
-    a, b = seg.a, seg.b
-    seg_len = dist(a, b)
-    if seg_len < 1e-6:
-        train.route_t += 1e-3
-        return
-    dt_px = train.auto_speed * dt
-    d_t = dt_px / seg_len
-    local_t += d_t
-    while local_t > 1.0 and seg_i < total_segments-1:
-        local_t -= 1.0
-        seg_i += 1
-        seg = route.segments[seg_i]
-        a, b = seg.a, seg.b
-        seg_len = dist(a, b)
-    if local_t > 1.0 and seg_i == total_segments-1:
-        seg_i = 0
-        local_t = 0.0
-    train.route_t = seg_i + local_t
-    train.x, train.y = lerp(a, b, local_t)
-
-def find_nearby_tower(towers: List[CellTower], pos: Tuple[float, float], radius=150) -> Optional[CellTower]:
-    best = None; best_d = 1e9
-    for tw in towers:
-        d = dist(tw.pos(), pos)
-        if d <= radius and d < best_d:
-            best = tw; best_d = d
-    return best
+    train.route_t, train.x, train.y = route.advance_fixed(train.route_t, train.auto_speed * dt)
 
 def main():
     try:
@@ -375,6 +485,8 @@ def main():
         ui = UI(rlce, train)
         running = True
         last = time.time()
+        last_frame = None  # state drawn by the previous frame
+        keys_down = 0      # bitmap of held arrow keys, see ARROW_BITS
         log("startup OK")
 
         while running:
@@ -382,11 +494,20 @@ def main():
             dt = now - last
             last = now
 
+            dirty = False  # any event (keys, expose, resize) forces a redraw
             for e in pygame.event.get():
+                dirty = True
                 if e.type == pygame.QUIT:
                     running = False
+                elif e.type == pygame.WINDOWFOCUSLOST:
+                    keys_down = 0  # KEYUPs are not delivered while unfocused
+                elif e.type == pygame.KEYUP:
+                    if e.key in ARROW_BITS:
+                        keys_down &= ~(1 << ARROW_BITS[e.key])
                 elif e.type == pygame.KEYDOWN:
-                    if e.key == pygame.K_ESCAPE:
+                    if e.key in ARROW_BITS:
+                        keys_down |= 1 << ARROW_BITS[e.key]
+                    elif e.key == pygame.K_ESCAPE:
                         # Debounce: ignore ESC for first 500ms after startup
                         if now - start_time < ESC_DEBOUNCE_S:
                             rlce.log.append("ESC ignored (debounce)")
@@ -399,7 +520,7 @@ def main():
                     elif e.key == pygame.K_SPACE:
                         train.auto = not train.auto
                     elif e.key == pygame.K_r:
-                        tw = find_nearby_tower(towers, train.pos(), radius=200)
+                        tw = rlce.find_nearby_tower(train.pos_f32(), radius=200)
                         if tw is None:
                             rlce.log.append("no tower nearby to toggle")
                         else:
@@ -410,6 +531,8 @@ def main():
                             else:
                                 tw.plmn = rlce.route.operator_plmn
                                 tw.arfcn = list(ALLOWED_ARFCN[tw.tech])[0]
+                            rlce.refresh_towers()
+                            ui.refresh_towers()
                             rlce.rebuild_cal()
                             rlce.log.append(f"tower {tw.id} rogue={tw.rogue}")
                     elif e.key == pygame.K_g:
@@ -425,51 +548,45 @@ def main():
                     elif e.key == pygame.K_4:
                         rlce.poll_ms = min(1000, rlce.poll_ms + 25)
                     elif e.key == pygame.K_l:
-                        seg_idx = rlce.locate_segment(train.pos())
-                        window = rlce.cal_window(seg_idx)
-                        candidates = [tw for tw in towers if tw.id in window]
-                        if candidates:
-                            rlce.last_serving = min(candidates, key=lambda tw: dist(tw.pos(), train.pos()))
+                        p = train.pos_f32()
+                        seg_idx = rlce.locate_segment(p)
+                        nearest = rlce.nearest_in_window(p, seg_idx)
+                        if nearest is not None:
+                            rlce.last_serving = nearest
                             rlce.log.append(f"forced reselection -> {rlce.last_serving.id}")
                         else:
                             rlce.log.append("no in-window towers for reselection")
                     elif e.key == pygame.K_n:
                         towers[:] = make_towers(70)
                         rlce.towers = towers
+                        rlce.refresh_towers()
+                        ui.refresh_towers()
                         rlce.rebuild_cal()
                     elif e.key == pygame.K_s:
                         ui.save_screenshot()
 
             # movement
-            keys = pygame.key.get_pressed()
             if not train.auto:
-                vx = vy = 0.0
-                if keys[pygame.K_LEFT]:  vx -= train.speed
-                if keys[pygame.K_RIGHT]: vx += train.speed
-                if keys[pygame.K_UP]:    vy -= train.speed
-                if keys[pygame.K_DOWN]:  vy += train.speed
+                vx = ((keys_down >> BIT_RIGHT) & 1) - ((keys_down >> BIT_LEFT) & 1)
+                vy = ((keys_down >> BIT_DOWN) & 1) - ((keys_down >> BIT_UP) & 1)
                 if vx or vy:
                     n = math.hypot(vx, vy)
-                    if n > 0:
-                        train.x += (vx/n) * dt * train.speed
-                        train.y += (vy/n) * dt * train.speed
+                    train.x += (vx/n) * dt * train.speed
+                    train.y += (vy/n) * dt * train.speed
             else:
                 advance_along_route(train, route, dt)
 
             # RLCE step
-            step_out = rlce.step(train, now)
-            if step_out is None:
-                seg_idx = rlce.locate_segment(train.pos())
-                decision = "…"
-                serving = rlce.last_serving
-            else:
-                seg_idx, decision, serving = step_out
-
-            # draw
-            ui.screen.fill(BG)
+            seg_idx, decision, serving, window_ids = rlce.step(train, now)
+
+            # draw, unless nothing visible changed since the last frame
+            frame = (train.x, train.y, seg_idx, decision, serving.id if serving else -1, rlce.grace, window_ids)
+            if not dirty and frame == last_frame:
+                ui.clock.tick(FPS)
+                continue
+            last_frame = frame
             ui.draw_route()
             ui.draw_segment_window(seg_idx)
-            window_ids = rlce.cal_window(seg_idx)
             ui.draw_towers(serving, window_ids)
             ui.draw_train()
             ui.draw_panel(seg_idx, decision, serving)